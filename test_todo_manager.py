@@ -2,6 +2,7 @@ import unittest
 import os
 import csv
 import json
+import shutil
 from todo_manager import TodoManager, Task
 
 
@@ -23,6 +24,11 @@ class TestTodoManager(unittest.TestCase):
             os.remove("test_archive.json")
         if os.path.exists("test_export.csv"):
             os.remove("test_export.csv")
+        if os.path.exists("test_replica.json"):
+            os.remove("test_replica.json")
+        for file in ["test_tasks.sync.json", "test_replica.sync.json"]:
+            if os.path.exists(file):
+                os.remove(file)
 
     # Basic Task Operations
     def test_add_task(self):
@@ -81,6 +87,15 @@ class TestTodoManager(unittest.TestCase):
         tasks = self.manager.list_tasks()
         self.assertEqual(len(tasks), 0)
 
+    def test_add_task_after_delete_does_not_reuse_live_id(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        self.manager.add_task("Task 3", "2024-12-29")
+        self.manager.delete_task(1)
+        self.manager.add_task("Task 4", "2024-12-28")
+        task_ids = [task.task_id for task in self.manager.list_tasks()]
+        self.assertEqual(sorted(task_ids), [2, 3, 4])
+
     def test_delete_task_twice(self):
         self.manager.add_task("Task 1", "2024-12-31")
         self.manager.delete_task(1)
@@ -181,7 +196,258 @@ class TestTodoManager(unittest.TestCase):
             self.manager.load_tasks()
         self.assertIn("Missing required key in task data", str(context.exception))
 
+    # Change Feed and Sync
+    def _replica(self):
+        with open("test_replica.json", "w") as file:
+            file.write("[]")
+        replica = TodoManager(filename="test_replica.json", archive_filename="test_archive.json")
+        replica.apply_changes(self.manager.changes_since(0))
+        return replica
+
+    def test_changes_since_only_returns_newer_changes(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        revision = self.manager.revision
+        self.manager.update_task(2, name="Updated Task")
+        self.manager.update_task(2, priority="High")
+        changes = self.manager.changes_since(revision)
+        self.assertEqual(len(changes), 1)  # Only the latest change per task
+        self.assertEqual(changes[0]["task"]["id"], 2)
+        self.assertEqual(changes[0]["task"]["name"], "Updated Task")
+        self.assertEqual(changes[0]["task"]["priority"], "High")
+        self.assertEqual(self.manager.changes_since(self.manager.revision), [])
+
+    def test_changes_since_returns_copies(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        changes = self.manager.changes_since(0)
+        changes[0]["task"]["name"] = "Edited"
+        changes[0]["stamp"][0] = 0
+        changes.clear()
+        change = self.manager.changes_since(0)[0]
+        self.assertEqual(change["task"]["name"], "Task 1")
+        self.assertEqual(change["stamp"][0], change["revision"])
+
+    def test_changes_since_records_delete_and_undo(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.delete_task(1)
+        self.assertEqual(self.manager.changes_since()[-1]["action"], "delete")
+        self.manager.undo_last_action()
+        self.assertEqual(self.manager.changes_since()[-1]["action"], "upsert")
+
+    def test_sync_state_survives_reload(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        cursor = self.manager.revision
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertEqual(reloaded.replica_id, self.manager.replica_id)
+        self.assertEqual(reloaded.revision, cursor)
+        self.assertEqual(len(reloaded.changes_since(0)), 2)
+        reloaded.update_task(1, name="Updated Task")
+        changes = reloaded.changes_since(cursor)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]["task"]["name"], "Updated Task")
+
+    def test_sync_log_is_appended_and_compacted(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        for i in range(50):
+            self.manager.update_task(1, name=f"Edit {i}")
+        with open("test_tasks.sync.json", "r") as file:
+            lines = file.readlines()
+        self.assertLessEqual(len(lines), 2 * (len(self.manager.changes) + 1) + 1)
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertEqual(reloaded.changes_since(0), self.manager.changes_since(0))
+        self.assertEqual(reloaded.revision, self.manager.revision)
+
+    def test_load_seeds_feed_for_store_without_sync_state(self):
+        with open("test_tasks.json", "w") as file:
+            json.dump([Task(1, "Task 1", "2024-12-31").to_dict(), Task(2, "Task 2", "2024-12-30").to_dict()], file)
+        if os.path.exists("test_tasks.sync.json"):
+            os.remove("test_tasks.sync.json")
+        manager = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertFalse(os.path.exists("test_tasks.sync.json"))  # Loading doesn't write
+        changes = manager.changes_since(0)
+        self.assertEqual([change["action"] for change in changes], ["upsert", "upsert"])
+        # Once the feed has been read, its uids survive a reload
+        self.assertTrue(os.path.exists("test_tasks.sync.json"))
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertEqual(reloaded.changes_since(0), changes)
+
+    def test_load_records_tasks_removed_outside_manager(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        cursor = self.manager.revision
+        with open("test_tasks.json", "w") as file:
+            json.dump([self.manager.get_task(1).to_dict()], file)
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        changes = reloaded.changes_since(cursor)
+        self.assertEqual([(change["action"], change["uid"]) for change in changes], [("delete", self.manager.task_uids[2])])
+
+    def test_unreadable_sync_state_raises(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        with open("test_tasks.sync.json", "w") as file:
+            file.write("not json\n")
+        with self.assertRaises(ValueError) as context:
+            TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertIn("Unreadable sync state", str(context.exception))
+
+    def test_torn_sync_line_is_ignored(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        with open("test_tasks.sync.json", "a") as file:
+            file.write('{"uid": "abc", "id": 3, "revi')
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        self.assertEqual(reloaded.changes_since(0), self.manager.changes_since(0))
+
+    def test_changes_since_detects_reset_feed(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        cursor, replica_id = self.manager.revision, self.manager.replica_id
+        self.assertEqual(self.manager.changes_since(cursor, replica_id=replica_id), [])
+        os.remove("test_tasks.sync.json")
+        reloaded = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        with self.assertRaises(ValueError):
+            reloaded.changes_since(cursor, replica_id=replica_id)
+
+    def test_task_added_under_deleted_id_gets_new_uid(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        old_uid = self.manager.task_uids[2]
+        self.manager.delete_task(2)
+        self.assertNotIn(2, self.manager.task_uids)
+        with open("test_tasks.json", "w") as file:
+            json.dump([self.manager.get_task(1).to_dict(), Task(2, "New Task", "2024-12-29").to_dict()], file)
+        self.manager.load_tasks()
+        self.assertNotEqual(self.manager.task_uids[2], old_uid)
+        self.assertEqual(self.manager.changes_since(0)[-1]["task"]["name"], "New Task")
+        self.assertEqual(self.manager.changes[old_uid]["action"], "delete")
+
+    def test_undo_delete_restores_uid(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        uid = self.manager.task_uids[1]
+        self.manager.delete_task(1)
+        self.manager.undo_last_action()
+        self.assertEqual(self.manager.task_uids[1], uid)
+        self.assertEqual(self.manager.changes[uid]["action"], "upsert")
+
+    def test_apply_changes_converges_after_concurrent_edits(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        self.manager.add_task("Task 3", "2024-12-29")
+        replica = self._replica()
+        synced_local, synced_replica = self.manager.revision, replica.revision
+
+        # Concurrent edits on both stores, including a conflict on task 1
+        self.manager.update_task(1, name="Local Edit")
+        self.manager.delete_task(3)
+        replica.update_task(2, completed=True)
+        replica.update_task(1, name="Replica Edit")
+
+        replica.apply_changes(self.manager.changes_since(synced_local))
+        self.manager.apply_changes(replica.changes_since(synced_replica))
+
+        local_tasks = sorted(task.task_id for task in self.manager.tasks)
+        replica_tasks = sorted(task.task_id for task in replica.tasks)
+        self.assertEqual(local_tasks, [1, 2])
+        self.assertEqual(local_tasks, replica_tasks)
+        for task_id in local_tasks:
+            self.assertEqual(self.manager.get_task(task_id).to_dict(), replica.get_task(task_id).to_dict())
+        self.assertTrue(replica.get_task(2).completed)
+
+        # Replica state is persisted like any other mutation
+        with open("test_replica.json", "r") as file:
+            self.assertEqual(len(json.load(file)), 2)
+
+    def test_apply_changes_keeps_concurrently_added_tasks(self):
+        self.manager.add_task("base", "2024-12-31")
+        replica = self._replica()
+        synced_local, synced_replica = self.manager.revision, replica.revision
+
+        # Both stores pick task ID 2 for their new task
+        self.manager.add_task("A only", "2024-12-30")
+        replica.add_task("B only", "2024-12-29")
+
+        replica.apply_changes(self.manager.changes_since(synced_local))
+        self.manager.apply_changes(replica.changes_since(synced_replica))
+
+        for manager in [self.manager, replica]:
+            self.assertEqual(sorted(task.name for task in manager.tasks), ["A only", "B only", "base"])
+            task_ids = [task.task_id for task in manager.tasks]
+            self.assertEqual(len(task_ids), len(set(task_ids)))
+        # Later edits still reach the right task on the other store
+        replica.update_task(replica.search_tasks("A only")[0].task_id, priority="High")
+        self.manager.apply_changes(replica.changes_since(0))
+        self.assertEqual(self.manager.search_tasks("A only")[0].priority, "High")
+
+    def test_undo_after_apply_changes(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        replica = self._replica()
+        replica.update_task(1, name="Replica Edit")
+        task = self.manager.get_task(1)
+        self.manager.apply_changes(replica.changes_since(0))
+        self.assertIs(self.manager.get_task(1), task)  # Updated in place
+        self.assertEqual(task.name, "Replica Edit")
+        self.assertFalse(self.manager.undo_last_action())  # The remote edit is not undone
+        self.assertEqual(self.manager.get_task(1).name, "Replica Edit")
+
+    def test_undo_local_delete_after_remote_upsert(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        self.manager.add_task("Task 2", "2024-12-30")
+        replica = self._replica()
+        self.manager.update_task(1, name="Local Edit")
+        self.manager.delete_task(2)
+        replica.update_task(2, name="Replica Edit")
+        replica.update_task(2, priority="High")  # Later than the local delete, so it wins
+        self.manager.apply_changes(replica.changes_since(0))
+        self.assertEqual(self.manager.get_task(2).name, "Replica Edit")
+        self.assertTrue(self.manager.undo_last_action())  # Undoes the local update of task 1
+        self.assertEqual(self.manager.get_task(1).name, "Task 1")
+        # Only the add of task 1 is left; undoing the delete of task 2 would duplicate it
+        self.assertEqual([action for action, data in self.manager.history], ["add"])
+        task_ids = [task.task_id for task in self.manager.tasks]
+        self.assertEqual(sorted(task_ids), [1, 2])
+
+    def test_copying_task_file_to_bootstrap_replica_fails_loudly(self):
+        self.manager.add_task("x", "2024-12-31")
+        self.manager.add_task("y", "2024-12-30")
+        shutil.copy("test_tasks.json", "test_replica.json")
+        replica = TodoManager(filename="test_replica.json", archive_filename="test_archive.json")
+        with self.assertRaises(ValueError) as context:
+            replica.apply_changes(self.manager.changes_since(0))
+        self.assertIn("clone()", str(context.exception))
+        self.assertEqual([task.name for task in replica.tasks], ["x", "y"])
+
+    def test_clone_bootstraps_replica(self):
+        self.manager.add_task("x", "2024-12-31")
+        self.manager.add_task("y", "2024-12-30")
+        replica = self.manager.clone("test_replica.json", archive_filename="test_archive.json")
+        self.assertNotEqual(replica.replica_id, self.manager.replica_id)
+        self.assertEqual(replica.apply_changes(self.manager.changes_since(0)), 0)
+        self.assertEqual([task.to_dict() for task in replica.tasks], [task.to_dict() for task in self.manager.tasks])
+
+        cursor = replica.revision
+        replica.update_task(2, name="Replica Edit")
+        self.manager.apply_changes(replica.changes_since(cursor))
+        self.assertEqual([task.name for task in self.manager.tasks], ["x", "Replica Edit"])
+
+    def test_copying_sync_file_gives_replica_its_own_id(self):
+        self.manager.add_task("Task 1", "2024-12-31")
+        shutil.copy("test_tasks.json", "test_replica.json")
+        shutil.copy("test_tasks.sync.json", "test_replica.sync.json")
+        replica = TodoManager(filename="test_replica.json", archive_filename="test_archive.json")
+        self.assertNotEqual(replica.replica_id, self.manager.replica_id)
+        synced_local, synced_replica = self.manager.revision, replica.revision
+
+        # Both stores edit task 1 at the same revision
+        self.manager.update_task(1, name="A Edit")
+        replica.update_task(1, name="C Edit")
+        replica.apply_changes(self.manager.changes_since(synced_local))
+        self.manager.apply_changes(replica.changes_since(synced_replica))
+        self.assertEqual(self.manager.get_task(1).name, replica.get_task(1).name)
+
+        # The new id is kept once the replica has saved
+        reloaded = TodoManager(filename="test_replica.json", archive_filename="test_archive.json")
+        self.assertEqual(reloaded.replica_id, replica.replica_id)
+
 
 if __name__ == "__main__":
     unittest.main()
-
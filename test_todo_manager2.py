@@ -76,6 +76,7 @@ class TestTodoManager(unittest.TestCase):
         cls.test_file = "test_tasks.json"
         cls.archive_file = "test_archive.json"
         cls.csv_file = "test_tasks.csv"
+        cls.sync_file = "test_tasks.sync.json"
 
     def setUp(self):
         # Clean setup for every test
@@ -87,7 +88,7 @@ class TestTodoManager(unittest.TestCase):
         self._cleanup_files()
 
     def _cleanup_files(self):
-        for file in [self.test_file, self.archive_file, self.csv_file]:
+        for file in [self.test_file, self.archive_file, self.csv_file, self.sync_file]:
             if os.path.exists(file):
                 os.remove(file)
 
@@ -0,0 +1,138 @@
+import unittest
+import os
+import tempfile
+import todo_manager
+from todo_manager import TodoManager
+from todo_workload import IOMeter, TraceRecorder, generate_trace, parse_mix, replay_trace, load_trace, save_trace
+
+
+class TestTodoWorkload(unittest.TestCase):
+
+    def setUp(self):
+        with open("test_tasks.json", "w") as file:
+            file.write("[]")
+
+    def tearDown(self):
+        for file in ["test_tasks.json", "test_tasks.sync.json", "test_trace.json"]:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def test_generate_trace_is_deterministic(self):
+        self.assertEqual(generate_trace(200, 20, seed=1), generate_trace(200, 20, seed=1))
+        self.assertNotEqual(generate_trace(200, 20, seed=1), generate_trace(200, 20, seed=2))
+
+    def test_generate_trace_respects_mix_and_size(self):
+        trace = generate_trace(100, 10, mix=parse_mix("add_task=1,delete_task=0"))
+        self.assertEqual(len(trace["initial_tasks"]), 10)
+        self.assertEqual(len(trace["ops"]), 100)
+        self.assertTrue(all(call["op"] == "add_task" for call in trace["ops"]))
+
+    def test_parse_mix_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            parse_mix("add_task=1,rename_task=2")
+
+    def test_parse_mix_malformed(self):
+        for text in ["add_task", "add_task=", "add_task=x", "add_task=-1", "add_task=0", "add_task=0,delete_task=0"]:
+            with self.assertRaises(ValueError):
+                parse_mix(text)
+        with self.assertRaises(ValueError):
+            generate_trace(10, 1, mix={"add_task": 0})
+
+    def test_replay_is_deterministic(self):
+        trace = generate_trace(300, 30, seed=3)
+        first = replay_trace(trace)
+        second = replay_trace(trace)
+        self.assertEqual(first["final_tasks"], second["final_tasks"])
+        self.assertEqual(first["writes"], second["writes"])
+        self.assertEqual(first["ops"], 300)
+        self.assertEqual(sum(len(stats.samples) for stats in first["stats"].values()), 300)
+        self.assertAlmostEqual(first["total_seconds"], sum(sum(stats.samples) for stats in first["stats"].values()))
+        self.assertGreater(first["check_seconds"], 0)
+
+    def test_replay_reports_io(self):
+        trace = generate_trace(50, 5, mix={"add_task": 1})
+        report = replay_trace(trace)
+        self.assertEqual(report["io"]["tasks.json"]["writes"], 50)
+        self.assertEqual(report["io"]["tasks.sync.json"]["writes"], 50)
+        self.assertEqual(report["writes"], 100)
+        self.assertEqual(report["bytes_written"], sum(counts["bytes"] for counts in report["io"].values()))
+        self.assertEqual(report["invariant_violations"], 0)
+        self.assertEqual(len(report["final_tasks"]), 55)
+
+    def test_replay_counts_archive_and_export_writes(self):
+        trace = generate_trace(0, 5)
+        trace["ops"] = [
+            {"op": "mark_all_completed", "args": [], "kwargs": {}},
+            {"op": "archive_completed_tasks", "args": [], "kwargs": {}},
+            {"op": "export_tasks_to_csv", "args": ["ignored.csv"], "kwargs": {}},
+        ]
+        report = replay_trace(trace)
+        self.assertEqual(report["io"]["archive.json"]["writes"], 1)
+        self.assertEqual(report["io"]["tasks.csv"]["writes"], 1)
+        self.assertGreater(report["io"]["archive.json"]["bytes"], report["io"]["tasks.csv"]["bytes"])
+        self.assertEqual(report["io"]["tasks.json"]["writes"], 2)
+
+    def test_io_meter_counts_appends_and_nests(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "log.txt")
+            with IOMeter() as outer:
+                with IOMeter() as inner:
+                    with todo_manager.open(path, "w") as file:
+                        file.write("abc")
+                    with todo_manager.open(path, "a") as file:
+                        file.write("de")
+                    inner.collect()
+                outer.collect()
+            self.assertFalse(hasattr(todo_manager, "open"))
+        for meter in [inner, outer]:
+            self.assertEqual(meter.files["log.txt"], {"writes": 2, "bytes": 5})
+
+    def test_replay_reports_exceptions(self):
+        trace = generate_trace(0, 0)
+        trace["ops"] = [
+            {"op": "update_task", "args": [1], "kwargs": {"due_date": "INVALID_DATE"}},
+            {"op": "add_task", "args": ["Task 1", "2024-12-31"], "kwargs": {}},
+            {"op": "update_task", "args": [1], "kwargs": {"due_date": "INVALID_DATE"}},
+            {"op": "update_task", "args": [1], "kwargs": {"bogus": True}},
+        ]
+        report = replay_trace(trace)
+        errors = report["stats"]["update_task"].errors
+        self.assertEqual(errors["ValueError: Invalid due_date format, expected YYYY-MM-DD"], 1)
+        self.assertEqual(sum(count for error, count in errors.items() if error.startswith("TypeError")), 1)
+
+    def test_recorded_trace_replays_to_same_state(self):
+        manager = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        manager.add_task("Task 1", "2024-12-31")
+        recorder = TraceRecorder(manager)
+        recorder.add_task("Task 2", "2024-12-30", "High", "Work", None)
+        recorder.update_task(1, name="Updated Task")
+        recorder.mark_all_completed()
+        save_trace(recorder.trace(), "test_trace.json")
+
+        trace = load_trace("test_trace.json")
+        self.assertEqual([call["op"] for call in trace["ops"]], ["add_task", "update_task", "mark_all_completed"])
+        with tempfile.TemporaryDirectory() as workdir:
+            report = replay_trace(trace, workdir=workdir)
+        self.assertEqual(report["final_tasks"], [task.to_dict() for task in manager.tasks])
+
+    def test_recorded_trace_starts_from_existing_tasks(self):
+        manager = TodoManager(filename="test_tasks.json", archive_filename="test_archive.json")
+        manager.add_task("Task 1", "2024-12-31")
+        manager.add_task("Task 2", "2024-12-30")
+        manager.add_task("Task 3", "2024-12-29")
+        manager.add_task("Task 4", "2024-12-28")
+        manager.update_task(1, completed=True)
+        manager.update_task(2, completed=True)
+        manager.delete_task(3)  # Leaves a gap in the IDs
+        recorder = TraceRecorder(manager)
+        recorder.update_task(4, name="Updated Task")
+        recorder.delete_task(2)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            report = replay_trace(recorder.trace(), workdir=workdir)
+        self.assertEqual(report["final_tasks"], [task.to_dict() for task in manager.tasks])
+        self.assertEqual([task["completed"] for task in report["final_tasks"]], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
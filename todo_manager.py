@@ -1,5 +1,9 @@
 import json
 import csv
+import os
+import socket
+import uuid
+import zlib
 from datetime import datetime, timedelta
 
 
@@ -50,12 +54,43 @@ class Task:
         return None
 
 
+def _sync_filename_for(filename):
+    # Sync state lives next to the task file so tasks.json keeps its format
+    return os.path.splitext(filename)[0] + ".sync.json"
+
+
+def _sync_header(replica_id, sync_filename):
+    # Host and path identify the copy of the sync file a replica_id belongs to
+    return {"replica_id": replica_id, "host": socket.gethostname(), "path": os.path.realpath(sync_filename)}
+
+
+def _write_json_lines(filename, mode, lines):
+    with open(filename, mode) as file:
+        file.write("".join(json.dumps(line) + "\n" for line in lines))
+
+
+def _task_digest(task):
+    # Lets a reload spot tasks edited outside the manager without keeping a
+    # second copy of every task in the sync state.
+    return zlib.crc32(json.dumps(task.to_dict(), sort_keys=True).encode())
+
+
 class TodoManager:
-    def __init__(self, filename="tasks.json", archive_filename="archive.json"):
+    def __init__(self, filename="tasks.json", archive_filename="archive.json", replica_id=None, sync_filename=None):
         self.filename = filename
         self.archive_filename = archive_filename
+        self.sync_filename = sync_filename or _sync_filename_for(filename)
+        self.replica_id = replica_id
         self.tasks = []
         self.history = []
+        self.revision = 0
+        self.task_uids = {}  # task_id -> uid that identifies the task across stores
+        self.uid_tasks = {}  # uid -> Task
+        self.changes = {}  # uid -> latest change for that task
+        self.unsaved_changes = set()  # uids changed since the sync file was written
+        self.sync_log_lines = 0
+        self.sync_header = None  # Header of the sync file on disk
+        self.load_sync_state()
         self.load_tasks()
 
     def load_tasks(self, raise_exceptions=False):
@@ -63,22 +98,121 @@ class TodoManager:
             with open(self.filename, "r") as file:
                 data = json.load(file)
                 self.tasks = [Task.from_dict(task) for task in data]
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+        except FileNotFoundError as e:
+            self.tasks = []
+            if raise_exceptions:  # For testing purposes
+                raise e
+        except json.JSONDecodeError as e:
             self.tasks = []
+            self.uid_tasks = {}
             if raise_exceptions:  # For testing purposes
                 raise e
+            return  # Don't turn an unreadable file into deletes in the feed
+        self._reconcile_changes()
 
     def save_tasks(self):
         with open(self.filename, "w") as file:
             json.dump([task.to_dict() for task in self.tasks], file, indent=4)
+        self.save_sync_state()
+
+    def load_sync_state(self):
+        try:
+            with open(self.sync_filename, "r") as file:
+                text = file.read()
+        except FileNotFoundError:
+            text = ""
+        lines = text.split("\n")[:-1]  # Drops a line torn by a crash mid-append
+        try:
+            lines = [json.loads(line) for line in lines]
+            for line in lines:
+                if "replica_id" in line:
+                    self.sync_header = line
+                else:
+                    # Later lines supersede earlier ones for the same task
+                    self.changes[line.pop("uid")] = line
+                    self.revision = max(self.revision, line["revision"])
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            # Starting over would give every task a new uid and rewind the revision,
+            # so replicas would duplicate tasks and consumers would skip changes.
+            raise ValueError(f"Unreadable sync state in {self.sync_filename}: {e}")
+        self.sync_log_lines = len(lines)
+        self.task_uids = {change["id"]: uid for uid, change in self.changes.items() if change["action"] == "upsert"}
+        if not self.replica_id and self.sync_header:
+            # A sync file copied from another store keeps that store's replica_id.
+            # Two stores sharing one would tie on stamps and never converge.
+            if _sync_header(self.sync_header["replica_id"], self.sync_filename) == self.sync_header:
+                self.replica_id = self.sync_header["replica_id"]
+        self.replica_id = self.replica_id or uuid.uuid4().hex
+
+    def save_sync_state(self):
+        # The sync file is a JSON-lines log: a header, then one line per change.
+        # A save appends the changes made since the last one, and the log is
+        # rewritten with only the latest change per task once it doubles.
+        header = _sync_header(self.replica_id, self.sync_filename)
+        if header != self.sync_header or self.sync_log_lines > 2 * (len(self.changes) + 1):
+            mode = "w"
+            lines = self._sync_log(header)
+            self.sync_header = header
+        else:
+            mode = "a"
+            lines = [dict(self.changes[uid], uid=uid) for uid in self.unsaved_changes]
+            lines.sort(key=lambda line: line["revision"])
+        _write_json_lines(self.sync_filename, mode, lines)
+        self.sync_log_lines = len(lines) if mode == "w" else self.sync_log_lines + len(lines)
+        self.unsaved_changes = set()
+
+    def _sync_log(self, header):
+        return [header] + [dict(change, uid=uid) for uid, change in self.changes.items()]
+
+    def _share_feed(self):
+        # Once others may hold uids or revisions from the feed, they must survive
+        # a restart, so write out anything recorded since the last save.
+        if self.unsaved_changes or not os.path.exists(self.sync_filename):
+            self.save_sync_state()
+
+    def clone(self, filename, archive_filename="archive.json"):
+        """Create a replica of this store in `filename` and return its manager.
+
+        The replica starts with this store's tasks, uids and feed but gets its
+        own replica_id. Copying tasks.json by hand loses the uids, so replicas
+        should be created this way.
+        """
+        self._share_feed()
+        with open(filename, "w") as file:
+            json.dump([task.to_dict() for task in self.tasks], file, indent=4)
+        sync_filename = _sync_filename_for(filename)
+        _write_json_lines(sync_filename, "w", self._sync_log(_sync_header(uuid.uuid4().hex, sync_filename)))
+        return TodoManager(filename=filename, archive_filename=archive_filename)
+
+    def _reconcile_changes(self):
+        # Record anything that differs from the saved feed, e.g. a store created
+        # before sync existed or a tasks.json that was edited or copied in. This
+        # is only written out with the next save, so loading never writes files.
+        known_uids = self.task_uids
+        self.task_uids = {}
+        self.uid_tasks = {}
+        for task in self.tasks:
+            uid = known_uids.get(task.task_id) or uuid.uuid4().hex
+            self._link_task(task, uid)
+            change = self.changes.get(uid)
+            if change is None or change["action"] != "upsert" or change["digest"] != _task_digest(task):
+                self._record_change("upsert", task.task_id, task)
+        for uid, change in list(self.changes.items()):
+            if change["action"] == "upsert" and uid not in self.uid_tasks:
+                self._record_change("delete", change["id"], uid=uid)
 
     def add_task(self, name, due_date, priority="Medium", category="General", recurrence=None):
-        task_id = len(self.tasks) + 1
+        task_id = self._next_task_id()
         task = Task(task_id, name, due_date, priority, category, recurrence=recurrence)
+        self._link_task(task, uuid.uuid4().hex)
         self.tasks.append(task)
         self.history.append(("add", task))
+        self._record_change("upsert", task.task_id, task)
         self.save_tasks()
 
+    def _next_task_id(self):
+        return max((task.task_id for task in self.tasks), default=0) + 1
+
     def get_task(self, task_id):
         for task in self.tasks:
             if task.task_id == task_id:
@@ -106,6 +240,7 @@ class TodoManager:
             if recurrence is not None:
                 task.recurrence = recurrence
             self.history.append(("update", old_task))
+            self._record_change("upsert", task.task_id, task)
             self.save_tasks()
             return True
         return False
@@ -115,6 +250,8 @@ class TodoManager:
         if task:
             self.tasks.remove(task)
             self.history.append(("delete", task))
+            self._record_change("delete", task.task_id)
+            self._unlink_task(task)
             self.save_tasks()
             return True
         return False
@@ -123,6 +260,7 @@ class TodoManager:
         for task in self.tasks:
             if not task.completed:
                 task.completed = True
+                self._record_change("upsert", task.task_id, task)
         self.history.append(("bulk_complete", None))
         self.save_tasks()
 
@@ -130,6 +268,9 @@ class TodoManager:
         completed_tasks = [task for task in self.tasks if task.completed]
         with open(self.archive_filename, "w") as file:
             json.dump([task.to_dict() for task in completed_tasks], file, indent=4)
+        for task in completed_tasks:
+            self._record_change("delete", task.task_id)
+            self._unlink_task(task)
         self.tasks = [task for task in self.tasks if not task.completed]
         self.save_tasks()
 
@@ -178,23 +319,160 @@ class TodoManager:
         action, data = self.history.pop()
         if action == "add":
             self.tasks.remove(data)
+            self._record_change("delete", data.task_id)
+            self._unlink_task(data)
         elif action == "update":
             task = self.get_task(data["id"])
             if task:
-                task.name = data["name"]
-                task.due_date = data["due_date"]
-                task.priority = data["priority"]
-                task.category = data["category"]
-                task.completed = data["completed"]
-                task.recurrence = data["recurrence"]
+                self._restore_task(task, data)
+                self._record_change("upsert", task.task_id, task)
         elif action == "delete":
             self.tasks.append(data)
+            self._link_task(data, self._deleted_uid(data.task_id))
+            self._record_change("upsert", data.task_id, data)
         elif action == "bulk_complete":
             for task in self.tasks:
-                task.completed = False
+                if task.completed:
+                    task.completed = False
+                    self._record_change("upsert", task.task_id, task)
         self.save_tasks()
         return True
 
+    def _restore_task(self, task, data):
+        task.name = data["name"]
+        task.due_date = data["due_date"]
+        task.priority = data["priority"]
+        task.category = data["category"]
+        task.completed = data["completed"]
+        task.recurrence = data["recurrence"]
+
+    def _forget_history(self, task_id):
+        # Undo entries for a task that a remote change overwrote would restore
+        # stale objects or values, so drop them. Bulk completes touch every task.
+        def touches(entry):
+            action, data = entry
+            if action == "update":
+                return data["id"] == task_id
+            if action in ("add", "delete"):
+                return data.task_id == task_id
+            return action == "bulk_complete"
+        self.history = [entry for entry in self.history if not touches(entry)]
+
+    def _record_change(self, action, task_id, task=None, stamp=None, uid=None):
+        # Every mutation gets the next revision. Only the latest change per task
+        # is kept, so a feed is proportional to the number of tasks touched.
+        self.revision += 1
+        if stamp is None:
+            stamp = [self.revision, self.replica_id]
+        uid = uid or self.task_uids[task_id]
+        self.changes[uid] = {
+            "id": task_id,
+            "revision": self.revision,
+            "stamp": stamp,
+            "action": action,
+            "digest": _task_digest(task) if task else None,
+        }
+        self.unsaved_changes.add(uid)
+
+    def _link_task(self, task, uid):
+        self.task_uids[task.task_id] = uid
+        self.uid_tasks[uid] = task
+
+    def _unlink_task(self, task):
+        # Forget the ID too, so a later task that reuses it gets a new uid
+        self.uid_tasks.pop(self.task_uids.pop(task.task_id, None), None)
+
+    def _deleted_uid(self, task_id):
+        # Undoing a delete brings back the same task, so reuse its tombstoned uid
+        deleted = [
+            (change["revision"], uid) for uid, change in self.changes.items()
+            if change["action"] == "delete" and change["id"] == task_id and uid not in self.uid_tasks
+        ]
+        return max(deleted)[1] if deleted else uuid.uuid4().hex
+
+    def changes_since(self, revision=0, replica_id=None):
+        """Return the changes made after `revision`, oldest first.
+
+        Upserts carry the task as it is now, so the feed holds one entry per
+        changed task however many times it changed. Pass the replica_id the
+        cursor was taken from to get a ValueError if this store's feed has been
+        reset since, e.g. because its sync file was deleted.
+        """
+        if replica_id is not None and replica_id != self.replica_id:
+            raise ValueError(
+                f"Feed of {self.filename} was reset (replica {self.replica_id}, cursor from {replica_id}); "
+                "sync again from revision 0"
+            )
+        self._share_feed()
+        changes = []
+        for uid, change in self.changes.items():
+            if change["revision"] > revision:
+                task = self.uid_tasks.get(uid) if change["action"] == "upsert" else None
+                changes.append({
+                    "revision": change["revision"],
+                    "stamp": list(change["stamp"]),
+                    "action": change["action"],
+                    "uid": uid,
+                    "task": task.to_dict() if task else None,
+                })
+        return sorted(changes, key=lambda change: change["revision"])
+
+    def apply_changes(self, changes):
+        """Apply a feed from another store's changes_since().
+
+        Tasks are matched by uid, not task_id. Conflicting edits to the same task
+        are resolved last-writer-wins on the change stamp (revision, replica_id),
+        so stores converge whichever order they sync in. task_id is local to each
+        store: a new task keeps its ID unless that ID is taken here, in which case
+        it gets the next free one. Returns the number of changes applied.
+
+        Raises ValueError, before applying anything, if a new task in the feed
+        matches a local task under a different uid. That happens when a replica
+        was bootstrapped by copying tasks.json instead of with clone().
+        """
+        for change in changes:
+            if change["action"] == "upsert" and change["uid"] not in self.changes:
+                task = self.get_task(change["task"]["id"])
+                if task and task.to_dict() == change["task"]:
+                    raise ValueError(
+                        f"Task {task.task_id} in {self.filename} matches a task from another store under a "
+                        "different uid; create replicas with clone() instead of copying the task file"
+                    )
+        applied = 0
+        for change in changes:
+            stamp = list(change["stamp"])
+            # Keep revisions ahead of anything seen, so later local edits win.
+            self.revision = max(self.revision, stamp[0])
+            uid = change["uid"]
+            current = self.changes.get(uid)
+            if current is not None and current["stamp"] >= stamp:
+                continue
+            task = self.uid_tasks.get(uid)
+            if change["action"] == "delete":
+                if task:
+                    self.tasks.remove(task)
+                    self._unlink_task(task)
+                    self._forget_history(task.task_id)
+                self._record_change("delete", None, stamp=stamp, uid=uid)
+                applied += 1
+                continue
+            if task:
+                self._restore_task(task, change["task"])
+            else:
+                task_id = change["task"]["id"]
+                if self.get_task(task_id) is not None:
+                    task_id = self._next_task_id()
+                task = Task.from_dict(change["task"])
+                task.task_id = task_id
+                self._link_task(task, uid)
+                self.tasks.append(task)
+            self._forget_history(task.task_id)
+            self._record_change("upsert", task.task_id, task, stamp=stamp, uid=uid)
+            applied += 1
+        if applied:
+            self.save_tasks()
+        return applied
+
     def get_overdue_tasks(self):
         today = datetime.now().date()
         return [task for task in self.tasks if datetime.strptime(task.due_date, "%Y-%m-%d").date() < today and not task.completed]
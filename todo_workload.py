@@ -0,0 +1,336 @@
+import argparse
+import builtins
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import todo_manager
+from todo_manager import CLI, Task, TodoManager
+
+
+# Operation weights, mirroring the actions in todo_manager.tstl / todo_manager2.tstl
+DEFAULT_MIX = {
+    "add_task": 30,
+    "update_task": 25,
+    "delete_task": 10,
+    "list_tasks": 10,
+    "search_tasks": 10,
+    "mark_all_completed": 2,
+    "archive_completed_tasks": 2,
+    "export_tasks_to_csv": 1,
+    "undo_last_action": 10,
+}
+
+RECORDED_OPS = set(DEFAULT_MIX) | {"get_task", "get_overdue_tasks"}
+
+
+def random_string(rng):
+    """Generate a random string."""
+    length = rng.randint(5, 20)
+    return "".join(rng.choices("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ", k=length))
+
+
+def random_date(rng):
+    """Generate a random valid date."""
+    year = rng.randint(2023, 2030)
+    month = rng.randint(1, 12)
+    day = rng.randint(1, 28)
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def parse_mix(text):
+    """Parse an op mix like "add_task=5,delete_task=1"."""
+    mix = {}
+    for item in text.split(","):
+        op, sep, weight = item.partition("=")
+        op = op.strip()
+        if not sep:
+            raise ValueError(f"Expected op=weight in mix, got: {item.strip()}")
+        if op not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation in mix: {op}")
+        try:
+            mix[op] = int(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {op} in mix: {weight.strip()}")
+        if mix[op] < 0:
+            raise ValueError(f"Negative weight for {op} in mix: {mix[op]}")
+    if not any(mix.values()):
+        raise ValueError("Mix needs at least one operation with a positive weight")
+    return mix
+
+
+def _mix_argument(text):
+    try:
+        return parse_mix(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _random_call(op, rng, id_range):
+    if op == "add_task":
+        args = [random_string(rng), random_date(rng), rng.choice(["High", "Medium", "Low"]), random_string(rng), None]
+        return {"op": op, "args": args, "kwargs": {}}
+    if op == "update_task":
+        kwargs = rng.choice([
+            {"name": random_string(rng)},
+            {"due_date": random_date(rng)},
+            {"priority": rng.choice(["High", "Medium", "Low"])},
+            {"completed": rng.random() < 0.5},
+        ])
+        return {"op": op, "args": [rng.randint(1, id_range)], "kwargs": kwargs}
+    if op == "delete_task":
+        return {"op": op, "args": [rng.randint(1, id_range)], "kwargs": {}}
+    if op == "list_tasks":
+        return {"op": op, "args": [], "kwargs": {"sort_by": rng.choice([None, "due_date", "priority", "name", "status"])}}
+    if op == "search_tasks":
+        return {"op": op, "args": [random_string(rng)[:3]], "kwargs": {}}
+    return {"op": op, "args": [], "kwargs": {}}
+
+
+def generate_trace(num_ops=1000, dataset_size=100, mix=None, seed=0):
+    """Generate a reproducible trace of random TodoManager calls."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    ops = [op for op in mix if mix[op] > 0]
+    if not ops:
+        raise ValueError("Mix needs at least one operation with a positive weight")
+    weights = [mix[op] for op in ops]
+    initial_tasks = []
+    for task_id in range(1, dataset_size + 1):
+        name, due_date, priority, category, recurrence = _random_call("add_task", rng, 1)["args"]
+        initial_tasks.append(Task(task_id, name, due_date, priority, category, recurrence=recurrence).to_dict())
+    id_range = max(dataset_size, 1) * 2
+    calls = [_random_call(op, rng, id_range) for op in rng.choices(ops, weights=weights, k=num_ops)]
+    return {"seed": seed, "dataset_size": dataset_size, "initial_tasks": initial_tasks, "ops": calls}
+
+
+def save_trace(trace, filename):
+    with open(filename, "w") as file:
+        json.dump(trace, file, indent=4)
+
+
+def load_trace(filename):
+    with open(filename, "r") as file:
+        return json.load(file)
+
+
+class TraceRecorder:
+    """Wrap a TodoManager and record every call made through it."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.calls = []
+        # Snapshot the store so replays start from the same tasks and IDs
+        self.initial_tasks = [task.to_dict() for task in manager.tasks]
+
+    def __getattr__(self, name):
+        attr = getattr(self.manager, name)
+        if name not in RECORDED_OPS:
+            return attr
+
+        def record(*args, **kwargs):
+            self.calls.append({"op": name, "args": list(args), "kwargs": kwargs})
+            return attr(*args, **kwargs)
+        return record
+
+    def trace(self):
+        return {"seed": None, "dataset_size": len(self.initial_tasks), "initial_tasks": self.initial_tasks, "ops": self.calls}
+
+
+def record_cli_session(filename):
+    """Run the interactive CLI and save the calls it makes as a trace."""
+    cli = CLI()
+    recorder = TraceRecorder(cli.manager)
+    cli.manager = recorder
+    try:
+        cli.run_cli()
+    finally:
+        save_trace(recorder.trace(), filename)
+
+
+class IOMeter:
+    """Count every file todo_manager opens for writing, per file name.
+
+    While active, the meter shadows open() in the todo_manager module. It only
+    notes which files were opened; collect() sizes them afterwards so stat
+    calls stay out of the timed operations. A rewrite counts the file's new
+    size and an append counts how much the file grew since the last collect().
+    """
+
+    def __init__(self):
+        self.files = {}  # file name -> {"writes": n, "bytes": n}
+        self.pending = []
+        self.sizes = {}  # path -> size at the last collect()
+        self.saved_open = None
+
+    def open(self, file, mode="r", *args, **kwargs):
+        if "w" in mode or "a" in mode:
+            self.pending.append((file, "a" in mode))
+        # Chain to any meter that was already active
+        return (self.saved_open or builtins.open)(file, mode, *args, **kwargs)
+
+    def collect(self):
+        for path, append in self.pending:
+            size = os.path.getsize(path)
+            counts = self.files.setdefault(os.path.basename(path), {"writes": 0, "bytes": 0})
+            counts["writes"] += 1
+            counts["bytes"] += size - self.sizes.get(path, 0) if append else size
+            self.sizes[path] = size
+        self.pending = []
+
+    def __enter__(self):
+        self.saved_open = getattr(todo_manager, "open", None)
+        todo_manager.open = self.open
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.saved_open is None:
+            del todo_manager.open
+        else:
+            todo_manager.open = self.saved_open
+
+
+class OpStats:
+    """Latency samples for one operation, bucketed by powers of two."""
+
+    def __init__(self):
+        self.samples = []
+        self.errors = Counter()  # "ExceptionType: message" -> count
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def histogram(self):
+        """Return a Counter of upper bucket bounds in microseconds -> count."""
+        buckets = Counter()
+        for seconds in self.samples:
+            bound = 1
+            while bound < seconds * 1e6:
+                bound *= 2
+            buckets[bound] += 1
+        return buckets
+
+
+def check_invariants(manager):
+    """Same property as todo_manager2.tstl: task IDs are unique."""
+    task_ids = [task.task_id for task in manager.tasks]
+    return len(task_ids) == len(set(task_ids))
+
+
+def replay_trace(trace, workdir=None):
+    """Replay a trace against a fresh TodoManager and collect timings.
+
+    The trace's initial tasks are written to the task file before the timed
+    run. Returns a report dict with per-op OpStats, I/O totals and invariant
+    violations.
+    """
+    cleanup = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="todo_workload_")
+    filename = os.path.join(workdir, "tasks.json")
+    archive_filename = os.path.join(workdir, "archive.json")
+    csv_filename = os.path.join(workdir, "tasks.csv")
+    try:
+        with open(filename, "w") as file:
+            json.dump(trace["initial_tasks"], file, indent=4)
+        manager = TodoManager(filename=filename, archive_filename=archive_filename)
+
+        stats = {}
+        violations = 0
+        check_seconds = 0.0
+        with IOMeter() as meter:
+            for call in trace["ops"]:
+                op = call["op"]
+                args = call["args"]
+                if op == "export_tasks_to_csv":
+                    args = [csv_filename]
+                op_stats = stats.setdefault(op, OpStats())
+                op_start = time.perf_counter()
+                try:
+                    getattr(manager, op)(*args, **call["kwargs"])
+                except Exception as e:
+                    # Keep replaying, but report what failed so bugs aren't hidden
+                    op_stats.errors[f"{type(e).__name__}: {e}"] += 1
+                op_stats.add(time.perf_counter() - op_start)
+                meter.collect()
+                check_start = time.perf_counter()
+                if not check_invariants(manager):
+                    violations += 1
+                check_seconds += time.perf_counter() - check_start
+        # Only time spent inside TodoManager counts towards throughput
+        total_seconds = sum(sum(op_stats.samples) for op_stats in stats.values())
+
+        return {
+            "ops": len(trace["ops"]),
+            "total_seconds": total_seconds,
+            "check_seconds": check_seconds,
+            "stats": stats,
+            "io": meter.files,
+            "writes": sum(counts["writes"] for counts in meter.files.values()),
+            "bytes_written": sum(counts["bytes"] for counts in meter.files.values()),
+            "invariant_violations": violations,
+            "final_tasks": [task.to_dict() for task in manager.tasks],
+        }
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def format_report(report):
+    lines = [
+        f"{report['ops']} ops in {report['total_seconds']:.3f}s, {report['ops'] / report['total_seconds']:.0f} ops/s "
+        f"(invariant checks: {report['check_seconds']:.3f}s)",
+        f"I/O: {report['writes']} writes, {report['bytes_written']} bytes",
+    ]
+    for name, counts in sorted(report["io"].items()):
+        lines.append(f"    {name:<22}{counts['writes']:>8} writes{counts['bytes']:>12} bytes")
+    lines += [
+        f"Invariant violations: {report['invariant_violations']}",
+        "",
+        f"{'operation':<26}{'count':>8}{'errors':>8}{'p50 us':>10}{'p99 us':>10}{'max us':>10}",
+    ]
+    for op, op_stats in sorted(report["stats"].items()):
+        lines.append(
+            f"{op:<26}{len(op_stats.samples):>8}{sum(op_stats.errors.values()):>8}"
+            f"{op_stats.percentile(0.5) * 1e6:>10.1f}{op_stats.percentile(0.99) * 1e6:>10.1f}"
+            f"{max(op_stats.samples) * 1e6:>10.1f}"
+        )
+        for bound, count in sorted(op_stats.histogram().items()):
+            lines.append(f"    <= {bound:>8} us  {count}")
+        for error, count in op_stats.errors.most_common():
+            lines.append(f"    error x{count}: {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay randomized TodoManager workloads and report latencies.")
+    parser.add_argument("--ops", type=int, default=1000, help="number of operations to generate")
+    parser.add_argument("--size", type=int, default=100, help="number of tasks loaded before the timed run")
+    parser.add_argument("--mix", type=_mix_argument, default=None, help="op weights, e.g. add_task=5,delete_task=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="save the generated trace to this file")
+    parser.add_argument("--replay", help="replay a saved trace instead of generating one")
+    parser.add_argument("--record", help="run the CLI and record the session to this file")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_cli_session(args.record)
+        return
+    if args.replay:
+        trace = load_trace(args.replay)
+    else:
+        trace = generate_trace(args.ops, args.size, args.mix, args.seed)
+        if args.save:
+            save_trace(trace, args.save)
+    print(format_report(replay_trace(trace)))
+
+
+if __name__ == "__main__":
+    main()